@@ -36,10 +36,12 @@ __email__ = "m.schroeder@tu-berlin.de"
 __status__ = "Beta"
 __docformat__ = 'reStructuredText'
 
+from collections import deque
 from ctypes import *
 from ctypes.util import find_library
 from enum import IntEnum
-from time import time
+from threading import Event, Thread
+from time import monotonic, sleep
 
 
 class CtypesEnum(IntEnum):
@@ -112,8 +114,10 @@ else:
     # This function obtains information on a specified device.
     libusbpt104.UsbPt104GetUnitInfo.argtypes = [c_short, POINTER(c_char), c_short, POINTER(c_short), PicoInfo]
 
-    # Get the most recent data reading from a channel.
-    libusbpt104.UsbPt104GetValue.argtypes = [c_short, Channels, POINTER(c_long), c_short]
+    # Get the most recent data reading from a channel. The channel is a
+    # plain c_short so the hot call skips the CtypesEnum.from_param hook;
+    # callers pass the pre-converted _ChannelState.id.
+    libusbpt104.UsbPt104GetValue.argtypes = [c_short, c_short, POINTER(c_long), c_short]
 
     # Open the device through its USB interface.
     libusbpt104.UsbPt104OpenUnit.argtypes = [POINTER(c_short), POINTER(c_char)]
@@ -125,30 +129,59 @@ else:
     # out electrical noise.
     libusbpt104.UsbPt104SetMains.argtypes = [c_short, c_ushort]
 
+    # bind the hot sampling call once; attribute lookups on the cdll object
+    # are not free in a tight polling loop
+    _get_value = libusbpt104.UsbPt104GetValue
+
+
+# shared ctypes scalars; immutable in practice, so one instance each is enough
+_C_USHORT_0 = c_ushort(0)
+_C_USHORT_1 = c_ushort(1)
+_C_SHORT_256 = c_short(256)
+
+# divisor applied by scale_value for each probe type (°C, mOhm or mV per count)
+_SCALE = {DataTypes.PT100: 1e3,
+          DataTypes.PT1000: 1e3,
+          DataTypes.RESISTANCE_TO_375R: 1e3,
+          DataTypes.RESISTANCE_TO_10K: 1.0,
+          DataTypes.DIFFERENTIAL_TO_115MV: 1e9,
+          DataTypes.SINGLE_ENDED_TO_115MV: 1e9,
+          DataTypes.DIFFERENTIAL_TO_2500MV: 1e8,
+          DataTypes.SINGLE_ENDED_TO_2500MV: 1e8}
+
+
+class _ChannelState(object):
+    """configuration and sampling state of a single channel"""
+    __slots__ = ('id', 'data_type', 'nb_wires', 'low_pass_filter', 'value', 'value_ptr', 'scale', 'last_query')
+
+    def __init__(self, channel):
+        # plain int of the Channels member, pre-converted for the hot call
+        self.id = int(channel)
+        self.data_type = DataTypes.OFF
+        self.nb_wires = Wires.WIRES_4
+        self.low_pass_filter = False
+        self.value = c_long(0)
+        # byref would build a fresh CArgObject per sample; keep one pointer
+        self.value_ptr = pointer(self.value)
+        # None until a probe type is configured; scale_value returns None then
+        self.scale = None
+        # 0.0 means never queried, so the first read does not wait
+        self.last_query = 0.0
+
 
 class PT104(object):
     def __init__(self):
-        self.channels = {Channels.CHANNEL_1: {'data_type': DataTypes.OFF,
-                                              'nb_wires': Wires.WIRES_4,
-                                              'low_pass_filter': False,
-                                              'value': c_long(0),
-                                              'last_query': time()},
-                         Channels.CHANNEL_2: {'data_type': DataTypes.OFF,
-                                              'nb_wires': Wires.WIRES_4,
-                                              'low_pass_filter': False,
-                                              'value': c_long(0),
-                                              'last_query': time()},
-                         Channels.CHANNEL_3: {'data_type': DataTypes.OFF,
-                                              'nb_wires': Wires.WIRES_4,
-                                              'low_pass_filter': False,
-                                              'value': c_long(0),
-                                              'last_query': time()},
-                         Channels.CHANNEL_4: {'data_type': DataTypes.OFF,
-                                              'nb_wires': Wires.WIRES_4,
-                                              'low_pass_filter': False,
-                                              'value': c_long(0),
-                                              'last_query': time()}}
+        self.channels = {channel: _ChannelState(channel) for channel in (Channels.CHANNEL_1,
+                                                                         Channels.CHANNEL_2,
+                                                                         Channels.CHANNEL_3,
+                                                                         Channels.CHANNEL_4)}
+        self._active_count = 0
+        #: seconds the ADC needs per active channel. 0.75 is the datasheet
+        #: worst case; with the low pass filter off and a single channel
+        #: active, values down to about 0.2 are viable.
+        self.conversion_time_per_channel = 0.75
         self._handle = None
+        self._info_buf = create_string_buffer(256)
 
     @staticmethod
     def discover_devices(communication_type=CommunicationType.CT_USB):
@@ -163,8 +196,7 @@ class PT104(object):
         libusbpt104.UsbPt104Enumerate(enum_string, enum_len, communication_type)
         return enum_string.value
 
-    @property
-    def get_unit_info(self, print_result=True):
+    def get_unit_info(self, print_result=False):
         """This function obtains information on a specified device.
 
         :param print_result: also print the unit info to the console
@@ -172,44 +204,21 @@ class PT104(object):
         """
         if not self.is_connected:
             return None
-        info_len = c_short(256)
-        info_string = create_string_buffer(256)
+        fields = [(PicoInfo.PICO_DRIVER_VERSION, 'driver_version'),
+                  (PicoInfo.PICO_USB_VERSION, 'usb_version'),
+                  (PicoInfo.PICO_HARDWARE_VERSION, 'hardware_version'),
+                  (PicoInfo.PICO_VARIANT_INFO, 'variant_info'),
+                  (PicoInfo.PICO_BATCH_AND_SERIAL, 'batch_and_serial'),
+                  (PicoInfo.PICO_CAL_DATE, 'cal_date'),
+                  (PicoInfo.PICO_KERNEL_DRIVER_VERSION, 'kernel_driver_version')]
         req_len = c_short()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len),
-                                        PicoInfo.PICO_DRIVER_VERSION)
-        driver_version = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len), PicoInfo.PICO_USB_VERSION)
-        usb_version = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len),
-                                        PicoInfo.PICO_HARDWARE_VERSION)
-        hardware_version = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len),
-                                        PicoInfo.PICO_VARIANT_INFO)
-        variant_info = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len),
-                                        PicoInfo.PICO_BATCH_AND_SERIAL)
-        batch_and_serial = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len), PicoInfo.PICO_CAL_DATE)
-        cal_date = info_string.value.decode()
-        libusbpt104.UsbPt104GetUnitInfo(self._handle, info_string, info_len, byref(req_len),
-                                        PicoInfo.PICO_KERNEL_DRIVER_VERSION)
-        kernel_driver_version = info_string.value.decode()
-        if print_result:
-            print('driver_version: %s' % driver_version)
-            print('usb_version: %s' % usb_version)
-            print('hardware_version:  %s' % hardware_version)
-            print('variant_info: %s' % variant_info)
-            print('batch_and_serial: %s' % batch_and_serial)
-            print('cal_date: %s' % cal_date)
-            print('kernel_driver_version: %s' % kernel_driver_version)
-
-        return dict(driver_version=driver_version,
-                    usb_version=usb_version,
-                    hardware_version=hardware_version,
-                    variant_info=variant_info,
-                    batch_and_serial=batch_and_serial,
-                    cal_date=cal_date,
-                    kernel_driver_version=kernel_driver_version)
+        result = {}
+        for info_id, key in fields:
+            libusbpt104.UsbPt104GetUnitInfo(self._handle, self._info_buf, _C_SHORT_256, byref(req_len), info_id)
+            result[key] = self._info_buf.value.decode()
+            if print_result:
+                print('%s: %s' % (key, result[key]))
+        return result
 
     @property
     def is_connected(self):
@@ -243,7 +252,7 @@ class PT104(object):
         status_unit = libusbpt104.UsbPt104OpenUnit(byref(self._handle), serial)
         if status_unit == 0:
             print('Picolog PT104 opened successfully')
-            _ = self.get_unit_info
+            _ = self.get_unit_info()
             self.set_channels()
             return True
         else:
@@ -257,12 +266,7 @@ class PT104(object):
 
         :return: number of active channels
         """
-        n = 0
-        for channel, conf in self.channels.items():
-            if conf['data_type'] == DataTypes.OFF:
-                continue
-            n += 1
-        return n
+        return self._active_count
 
     def disconnect(self):
         """disconnect from the unit
@@ -284,9 +288,12 @@ class PT104(object):
         :param low_pass_filter: use the low pass filter [True, False]
         :return: status
         """
-        self.channels[channel]['data_type'] = data_type
-        self.channels[channel]['nb_wires'] = nb_wires
-        self.channels[channel]['low_pass_filter'] = low_pass_filter
+        ch = self.channels[channel]
+        ch.data_type = data_type
+        ch.nb_wires = nb_wires
+        ch.low_pass_filter = low_pass_filter
+        ch.scale = _SCALE.get(data_type)
+        self._active_count = sum(1 for conf in self.channels.values() if conf.data_type != DataTypes.OFF)
         if not self.is_connected:
             # change config only
             return False
@@ -301,7 +308,7 @@ class PT104(object):
         """sets the channel configuration from self.channels
         """
         for channel, conf in self.channels.items():
-            self.set_channel(channel, conf['data_type'], conf['nb_wires'])
+            self.set_channel(channel, conf.data_type, conf.nb_wires)
 
     def get_value(self, channel, raw_value=False):
         """queries the measurement value from the unit
@@ -310,48 +317,70 @@ class PT104(object):
         :param raw_value: skip conversion
         :return: measured value
         """
-        if not self.is_connected:
+        handle = self._handle
+        if handle is None:
             return None
         self._wait_for_conversion(channel)
-        status_channel = libusbpt104.UsbPt104GetValue(self._handle,
-                                                      channel,
-                                                      byref(self.channels[channel]['value']),
-                                                      self.channels[channel]['low_pass_filter'])
-        self.channels[channel]['last_query'] = time()
+        ch = self.channels[channel]
+        # stamp before the blocking call so the next wait covers the I/O time
+        ch.last_query = monotonic()
+        status_channel = _get_value(handle,
+                                    ch.id,
+                                    ch.value_ptr,
+                                    ch.low_pass_filter)
         if status_channel == 0:
             if raw_value:
-                return float(self.channels[channel]['value'].value)
-            return self.scale_value(float(self.channels[channel]['value'].value), channel)
+                return float(ch.value.value)
+            return self.scale_value(float(ch.value.value), channel)
         else:
             return None
 
-    @property
-    def get_value_channel_1(self):
-        """queries the measurement value from channel 1
-        :return: scaled measured value
-        """
-        return self.get_value(Channels.CHANNEL_1)
+    def get_values(self, raw_value=False):
+        """queries all active channels in a single round-robin sweep
 
-    @property
-    def get_value_channel_2(self):
-        """queries the measurement value from channel 2
-        :return: scaled measured value
-        """
-        return self.get_value(Channels.CHANNEL_2)
+        The unit converts the active channels in turn, so one sweep only
+        has to wait conversion_time_per_channel per channel instead of the
+        full conversion window that an independent get_value call per
+        channel would enforce.
 
-    @property
-    def get_value_channel_3(self):
-        """queries the measurement value from channel 3
-        :return: scaled measured value
+        :param raw_value: skip conversion
+        :return: dict mapping each active channel to its measured value
         """
-        return self.get_value(Channels.CHANNEL_3)
-
-    @property
-    def get_value_channel_4(self):
-        """queries the measurement value from channel 4
+        handle = self._handle
+        if handle is None:
+            return None
+        start = monotonic()
+        values = {}
+        idx = 0
+        for channel, conf in self.channels.items():
+            if conf.data_type == DataTypes.OFF:
+                continue
+            idx += 1
+            remaining = start + idx * self.conversion_time_per_channel - monotonic()
+            if remaining > 0.001:
+                sleep(remaining)
+            conf.last_query = monotonic()
+            status_channel = _get_value(handle,
+                                        conf.id,
+                                        conf.value_ptr,
+                                        conf.low_pass_filter)
+            if status_channel == 0:
+                value = float(conf.value.value)
+                values[channel] = value if raw_value else value / conf.scale
+            else:
+                values[channel] = None
+        return values
+
+    def get_value_channel(self, channel):
+        """queries the measurement value from the given channel
+
+        Unlike the get_value_channel_<n> shortcuts this makes the blocking
+        read explicit at the call site and accepts a plain channel number.
+
+        :param channel: channel number (Channels or int)
         :return: scaled measured value
         """
-        return self.get_value(Channels.CHANNEL_4)
+        return self.get_value(Channels(channel))
 
     def set_mains(self, sixty_hertz=False):
         """This function is used to inform the driver of the local mains (line) frequency.
@@ -361,11 +390,7 @@ class PT104(object):
         :param sixty_hertz: mains frequency is sixty
         :return: success
         """
-        if sixty_hertz:
-            sixty_hertz = c_ushort(1)
-        else:
-            sixty_hertz = c_ushort(0)
-        libusbpt104.UsbPt104SetMains(self._handle, sixty_hertz)
+        libusbpt104.UsbPt104SetMains(self._handle, _C_USHORT_1 if sixty_hertz else _C_USHORT_0)
         return True
 
     def _wait_for_conversion(self, channel):
@@ -374,10 +399,13 @@ class PT104(object):
         :param channel: channel number (Channels)
         :return:
         """
-        conversion_time = self.active_channel_count * 0.75
-        last_query = self.channels[channel]['last_query']
-        while last_query + conversion_time > time():
-            pass
+        last_query = self.channels[channel].last_query
+        if last_query == 0.0:
+            return True
+        deadline = last_query + self._active_count * self.conversion_time_per_channel
+        remaining = deadline - monotonic()
+        if remaining > 0.001:
+            sleep(remaining)
         return True
 
     def scale_value(self, value, channel):
@@ -385,16 +413,91 @@ class PT104(object):
 
         :param value: value to convert as float
         :param channel: channel number (Channels)
-        :return: Temperature in °C, Resistance in mOhm, Voltage in mV
+        :return: Temperature in °C, Resistance in mOhm, Voltage in mV or
+            None if the channel is not configured
         """
-        if self.channels[channel]['data_type'] in [DataTypes.PT100, DataTypes.PT1000]:
-            return value / 10.0 ** 3  # °C
-        if self.channels[channel]['data_type'] == DataTypes.RESISTANCE_TO_375R:
-            return value / 10.0 ** 3  # mOhm
-        if self.channels[channel]['data_type'] == DataTypes.RESISTANCE_TO_10K:
-            return value  # mOhm
-        if self.channels[channel]['data_type'] in [DataTypes.DIFFERENTIAL_TO_115MV, DataTypes.SINGLE_ENDED_TO_115MV]:
-            return value / 10.0 ** 9  # mV
-        if self.channels[channel]['data_type'] in [DataTypes.DIFFERENTIAL_TO_2500MV,
-                                                   DataTypes.SINGLE_ENDED_TO_2500MV]:
-            return value / 10.0 ** 8  # mV
+        scale = self.channels[channel].scale
+        if scale is None:
+            return None
+        return value / scale
+
+
+class Poller(object):
+    """polls a PT104 unit from a background thread
+
+    The thread reads the given channels round-robin and appends
+    (timestamp, value) pairs to one ring buffer per channel, so the
+    consumer gets the latest reading without ever waiting for a
+    conversion. Useful when several units are logged from one process:
+    one Poller per unit overlaps their conversion waits.
+
+    Example::
+
+        poller = Poller(unit, [Channels.CHANNEL_1, Channels.CHANNEL_2])
+        ...
+        sample = poller.latest(Channels.CHANNEL_1)
+        if sample:
+            timestamp, value = sample
+        ...
+        poller.stop()
+    """
+
+    def __init__(self, daq, channels, maxlen=1024, retry_interval=0.5):
+        """
+        :param daq: a connected PT104 instance
+        :param channels: the channels to poll (iterable of Channels)
+        :param maxlen: length of the per-channel ring buffer
+        :param retry_interval: seconds to back off after a failed read
+        """
+        self.daq = daq
+        self.buf = {channel: deque(maxlen=maxlen) for channel in channels}
+        self.retry_interval = retry_interval
+        self._stop = Event()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for channel, buf in self.buf.items():
+                if self._stop.is_set():
+                    break
+                value = self.daq.get_value(channel)
+                if value is not None:
+                    buf.append((monotonic(), value))
+                else:
+                    # disconnected unit, failed read or unconfigured channel:
+                    # back off instead of spinning at retry cadence
+                    self._stop.wait(self.retry_interval)
+
+    def latest(self, channel):
+        """returns the newest (timestamp, value) pair of a channel without blocking
+
+        :param channel: channel number (Channels)
+        :return: (timestamp, value) or None if nothing was sampled yet
+        """
+        buf = self.buf[channel]
+        if not buf:
+            return None
+        return buf[-1]
+
+    def stop(self):
+        """stops the polling thread and waits for it to finish"""
+        self._stop.set()
+        self.thread.join()
+
+
+# generate the get_value_channel_<n> shortcuts of the original API instead of
+# keeping four copy-pasted property definitions
+for _n in (1, 2, 3, 4):
+    setattr(PT104, 'get_value_channel_%d' % _n,
+            property(lambda self, _channel=Channels(_n): self.get_value(_channel),
+                     doc='queries the measurement value from channel %d\n'
+                         '        :return: scaled measured value\n        ' % _n))
+del _n
+
+# optional Cython fast path; built only when Cython is available, the ctypes
+# wrapper above is the fallback
+try:
+    from ._pt104_fast import FastPT104
+except ImportError:
+    FastPT104 = None
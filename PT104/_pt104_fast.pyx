@@ -0,0 +1,64 @@
+# cython: language_level=3
+# -*- coding: utf-8 -*-
+"""Optional Cython fast path for the per-sample call into libusbpt104.
+
+The ctypes wrapper in :mod:`PT104` spends around 10 us per sample on
+argument marshalling, which dominates when several units are polled from
+one host. This module calls the C symbols directly and keeps the device
+handle as a native short. It is only compiled when Cython is available
+at build time; :mod:`PT104` falls back to the ctypes path otherwise.
+"""
+
+cdef extern from "usbPt104Api.h":
+    short UsbPt104OpenUnit(short *handle, char *serial) nogil
+    short UsbPt104CloseUnit(short handle) nogil
+    short UsbPt104SetChannel(short handle, short channel, short data_type, short nb_wires) nogil
+    short UsbPt104SetMains(short handle, unsigned short sixty_hertz) nogil
+    short UsbPt104GetValue(short handle, short channel, long *value, short filtered) nogil
+
+
+cdef class FastPT104:
+    """minimal native wrapper around the hot sampling path
+
+    Channel configuration and scale bookkeeping stay in the Python
+    :class:`PT104.PT104` class; this only covers connect, configure and
+    the per-sample read.
+    """
+    cdef short handle
+    cdef bint connected
+
+    def __cinit__(self):
+        self.handle = 0
+        self.connected = False
+
+    def connect(self, bytes serial=b''):
+        cdef short status = UsbPt104OpenUnit(&self.handle, serial)
+        self.connected = status == 0
+        return status
+
+    def disconnect(self):
+        if self.connected:
+            UsbPt104CloseUnit(self.handle)
+            self.connected = False
+
+    def set_channel(self, int channel, int data_type, int nb_wires):
+        return UsbPt104SetChannel(self.handle, <short>channel, <short>data_type, <short>nb_wires)
+
+    def set_mains(self, bint sixty_hertz=False):
+        return UsbPt104SetMains(self.handle, <unsigned short>sixty_hertz)
+
+    cpdef double get_value(self, int channel, double scale, bint low_pass_filter=False):
+        """read one sample and scale it, releasing the GIL during the call
+
+        :param channel: channel number
+        :param scale: divisor for the raw reading (see PT104 scale table)
+        :param low_pass_filter: use the low pass filter
+        :return: scaled measured value
+        """
+        cdef long raw = 0
+        cdef short status
+        with nogil:
+            status = UsbPt104GetValue(self.handle, <short>channel, &raw, <short>low_pass_filter)
+        if status != 0:
+            raise IOError('UsbPt104GetValue failed with status %d' % status)
+        return raw / scale
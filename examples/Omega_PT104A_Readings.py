@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Log temperature readings from channel 1 of an Omega PT-104A.
+
+Samples go into a preallocated NumPy array while the run is going, so
+the acquisition loop does no formatting, allocation or file I/O between
+readings. The log is serialized once at the end (also on interruption):
+as CSV via a single numpy.savetxt call by default, or as packed binary
+records of 12 bytes per sample when BINARY_LOG is set — roughly a
+fifth of the CSV volume, useful for runs of many hours. A binary log
+can be converted to CSV afterwards with struct.iter_unpack('<Iff', data).
+"""
+import struct
+from time import sleep, time
+
+import numpy as np
+
+from PT104 import PT104, Channels, DataTypes, Wires
+
+serial_number = 'AY429/026'
+sampling_rate_s = 1.0
+test_duration_s = 120
+file_name = 'pt104a_readings.csv'
+BINARY_LOG = False
+
+unit = PT104()
+if unit.connect(serial_number) is not True:
+    raise SystemExit('could not connect to unit %s' % serial_number)
+unit.set_channel(Channels.CHANNEL_1, DataTypes.PT100, Wires.WIRES_4)
+
+n_samples = int(test_duration_s / sampling_rate_s)
+samples = np.empty((n_samples, 4), dtype=np.float64)
+count = 0
+start_time = time()
+try:
+    for i in range(n_samples):
+        temperature_ch1 = unit.get_value_channel_1
+        time_elapsed_s = time() - start_time
+        if temperature_ch1 is None:
+            print('sample %d: no reading' % i)
+        else:
+            print('%.2f s CH1: %.3f °C' % (time_elapsed_s, temperature_ch1))
+            samples[count] = (i, time_elapsed_s, time_elapsed_s / 60.0, temperature_ch1)
+            count += 1
+        sleep(sampling_rate_s)
+finally:
+    unit.disconnect()
+    if BINARY_LOG:
+        with open(file_name + '.bin', 'wb') as results_file:
+            for row in samples[:count]:
+                results_file.write(struct.pack('<Iff', int(row[0]), row[1], row[3]))
+    else:
+        np.savetxt(file_name, samples[:count],
+                   fmt=['%d', '%.2f', '%.2f', '%.3f'], delimiter=',',
+                   header='sample,time_s,time_min,temperature_ch1_c', comments='')
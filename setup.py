@@ -1,8 +1,21 @@
 # -*- coding: utf-8 -*-
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
 import os
 import PT104
 
+# the Cython fast path is optional; without Cython only the ctypes
+# wrapper is installed, and optional=True lets a failed native build
+# (e.g. Pico SDK headers not installed) degrade to the ctypes path too
+try:
+    from Cython.Build import cythonize
+    ext_modules = cythonize([Extension('PT104._pt104_fast',
+                                       ['PT104/_pt104_fast.pyx'],
+                                       include_dirs=['/opt/picoscope/include/libusbpt104'],
+                                       libraries=['usbpt104'],
+                                       optional=True)])
+except ImportError:
+    ext_modules = []
+
 
 CLASSIFIERS = [
     'Development Status :: 4 - Beta',
@@ -28,6 +41,7 @@ setup(
     classifiers=CLASSIFIERS,
     install_requires=[],
     packages=find_packages(exclude=["project", "project.*"]),
+    ext_modules=ext_modules,
     include_package_data=True,
     test_suite='runtests.main',
 )